@@ -17,6 +17,7 @@ class WebSocketService extends ChangeNotifier {
   String? _lastMode;
   Set<String> _pressedButtons = {};
   String _enabledTeam = 'team_red';
+  int _boardVersion = -1; // Version of the last board snapshot or delta applied
   
   String? get lastServerUrl => _lastServerUrl;
   
@@ -71,7 +72,8 @@ class WebSocketService extends ChangeNotifier {
         },
         onDone: () {
           debugPrint('WebSocket connection closed');
-          _handleDisconnection();
+          // 1012 (Service Restart): a new server process already holds the port
+          _handleDisconnection(immediate: _channel?.closeCode == 1012);
           if (!completer.isCompleted) {
             completer.complete(false);
           }
@@ -101,19 +103,19 @@ class WebSocketService extends ChangeNotifier {
     }
   }
 
-  void _handleDisconnection() {
+  void _handleDisconnection({bool immediate = false}) {
     _isConnected = false;
     if (!_disposed) {
       notifyListeners();
     }
     
     // Start reconnection timer
-    _startReconnectionTimer();
+    _startReconnectionTimer(immediate ? Duration.zero : const Duration(seconds: 2));
   }
 
-  void _startReconnectionTimer() {
+  void _startReconnectionTimer([Duration delay = const Duration(seconds: 2)]) {
     _reconnectTimer?.cancel();
-    _reconnectTimer = Timer(const Duration(seconds: 2), () {
+    _reconnectTimer = Timer(delay, () {
       if (!_isConnected && _lastServerUrl != null && _lastMode != null) {
         debugPrint('Attempting to reconnect...');
         _connectInternal(_lastServerUrl!, _lastMode!, true);
@@ -177,8 +179,11 @@ class WebSocketService extends ChangeNotifier {
           _currentPage = data['page_id'];
           debugPrint('Rendering page: $_currentPage');
           
-          // Handle pressed buttons and team state for page 0
-          if (data['page_id'] == '0') {
+          // Full board snapshot, sent on (re)connect and on reset
+          if (data['board_version'] != null) {
+            _applyBoardSnapshot(data);
+          } else if (data['page_id'] == '0') {
+            // Older servers send pressed buttons and team state with every page 0 render
             if (data['pressed_buttons'] != null) {
               _pressedButtons = Set<String>.from(data['pressed_buttons']);
               debugPrint('Received pressed buttons: $_pressedButtons');
@@ -194,6 +199,36 @@ class WebSocketService extends ChangeNotifier {
           }
           break;
           
+        case 'board_snapshot':
+          _applyBoardSnapshot(data);
+          if (!_disposed) {
+            notifyListeners();
+          }
+          break;
+          
+        case 'board_delta':
+          final int version = data['version'];
+          if (version <= _boardVersion) {
+            break; // Already covered by a newer snapshot
+          }
+          if (version != _boardVersion + 1) {
+            // Missed a delta, ask for the whole board instead
+            debugPrint('Board version gap ($_boardVersion -> $version), requesting snapshot');
+            _sendMessage({'type': 'get_board'});
+            break;
+          }
+          _boardVersion = version;
+          if (data['pressed'] != null) {
+            _pressedButtons.add('${data['pressed'][0]}_${data['pressed'][1]}');
+          }
+          if (data['enabled_team'] != null) {
+            _enabledTeam = data['enabled_team'];
+          }
+          if (!_disposed) {
+            notifyListeners();
+          }
+          break;
+          
         default:
           debugPrint('Unknown message type: $type');
       }
@@ -202,6 +237,13 @@ class WebSocketService extends ChangeNotifier {
     }
   }
 
+  void _applyBoardSnapshot(Map<String, dynamic> data) {
+    _boardVersion = data['board_version'];
+    _pressedButtons = Set<String>.from(data['pressed_buttons']);
+    _enabledTeam = data['enabled_team'];
+    debugPrint('Received board snapshot v$_boardVersion: $_pressedButtons, enabled team: $_enabledTeam');
+  }
+
   void _sendMessage(Map<String, dynamic> message) {
     if (_channel != null) {
       _channel!.sink.add(json.encode(message));
@@ -0,0 +1,254 @@
+import asyncio
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+from host import QuizShowServer
+from replay import FakeWebSocket
+
+# Machine-specific, so it is not committed: create it with --save on the machine that runs the comparison
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# Stored alongside the results so a run on a busier or slower machine is scaled before comparing
+CALIBRATION = 'calibration'
+TEAMS = ['team_red', 'team_blue', 'team_yellow', 'team_green']
+
+def generate_config(cols=6, rows=8, image_pages=0):
+    """Build a config like a real show: a main grid whose cells lead to question pages"""
+    config = {
+        '0': {
+            'type': 'main',
+            'headers': [f"category {col}" for col in range(cols)],
+            'table': [
+                [{'titel': f"{(row + 1) * 100} points", 'link': f"q{col}_{row}"} for row in range(rows)]
+                for col in range(cols)
+            ]
+        },
+        # Long enough that it never runs out during a benchmark
+        'countdown': {'type': 'timer', 'time': 3600, 'text': 'Think', 'link': 'buzzer'},
+        'buzzer': {'type': 'buzzer', 'text': 'Buzzer', 'link': 'answer'},
+        'answer': {'type': 'text', 'text': 'Answer', 'link': '0'}
+    }
+    for col in range(cols):
+        for row in range(rows):
+            config[f"q{col}_{row}"] = {'type': 'text', 'text': f"Question {col}/{row}", 'link': 'countdown'}
+    for index in range(image_pages):
+        config[f"img{index}"] = {'type': 'image', 'image': f"images/photo{index}.jpg", 'link': '0'}
+    return config
+
+async def connect_clients(server, count):
+    """Register count fake clients, spread over the teams with one master"""
+    tasks = []
+    for index in range(count):
+        websocket = FakeWebSocket(f"192.168.0.{index % 250 + 2}")
+        tasks.append(asyncio.create_task(server.register_client(websocket)))
+        await asyncio.sleep(0)
+        client_id = next(reversed(server.clients))
+        mode = 'master' if index == 0 else TEAMS[index % len(TEAMS)]
+        await server.handle_message(client_id, json.dumps({'type': 'connect', 'mode': mode}))
+    return tasks
+
+async def disconnect_clients(server, tasks):
+    for websocket in list(server.clients.values()):
+        await websocket.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def clear_outboxes(server):
+    for websocket in server.clients.values():
+        websocket.sent.clear()
+
+async def measure(operation, repeat, setup=None):
+    """Median time of one awaited call in microseconds, setup excluded"""
+    for _ in range(max(repeat // 10, 5)):
+        # Warm up caches and lazily created objects before timing anything
+        if setup:
+            setup()
+        await operation()
+
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            await operation()
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return statistics.median(timings) * 1e6
+
+def calibration_cases(repeat, teardown):
+    """A fixed pure-Python workload that tracks how fast the machine is right now"""
+    config = generate_config()
+
+    async def workload():
+        json.loads(json.dumps(config))
+    return [(CALIBRATION, workload, repeat, None)]
+
+async def handle_message_cases(repeat, teardown):
+    """handle_message for every message type, with 10 clients listening"""
+    server = QuizShowServer(config=generate_config())
+    tasks = await connect_clients(server, 10)
+    master_id, team_id = list(server.clients)[:2]
+
+    def on_page(page_id):
+        def setup():
+            clear_outboxes(server)
+            server.global_current_page = page_id
+            for info in server.client_info.values():
+                info['current_page'] = page_id
+        return setup
+
+    def fresh_board():
+        on_page('0')()
+        server.board.clear()
+        server.enabled_team = server.client_info[team_id]['mode']
+
+    messages = [
+        ('connect', team_id, {'type': 'connect', 'mode': 'team_blue'}, on_page('0')),
+        ('reconnect', team_id, {'type': 'reconnect', 'mode': 'team_blue'}, on_page('0')),
+        ('ping', team_id, {'type': 'ping'}, on_page('0')),
+        ('get_clients', master_id, {'type': 'get_clients'}, on_page('0')),
+        ('get_board', team_id, {'type': 'get_board'}, on_page('0')),
+        ('grid_click', team_id, {'type': 'grid_click', 'row': 0, 'col': 0}, fresh_board),
+        ('buzzer_press', team_id, {'type': 'buzzer_press'}, on_page('buzzer')),
+        # Both switch to the countdown page and so start a server timer
+        ('timer_finished', team_id, {'type': 'timer_finished'}, on_page('q0_0')),
+        ('master_add_points', master_id, {'type': 'master_add_points', 'team': 'team_red', 'points': 100}, on_page('0')),
+        ('master_remove_points', master_id, {'type': 'master_remove_points', 'team': 'team_red', 'points': 100}, on_page('0')),
+        ('master_enable_team', master_id, {'type': 'master_enable_team', 'team': 'team_blue'}, on_page('0')),
+        ('master_reset', master_id, {'type': 'master_reset'}, on_page('0')),
+        ('next_slide', master_id, {'type': 'next_slide'}, on_page('q0_0')),
+        ('return_to_main', master_id, {'type': 'return_to_main'}, on_page('answer')),
+    ]
+
+    async def stop():
+        server.stop_timers()
+        await disconnect_clients(server, tasks)
+    teardown.append(stop)
+
+    def handle(client_id, raw):
+        return lambda: server.handle_message(client_id, raw)
+
+    return [
+        (f"handle_message[{name}]", handle(client_id, json.dumps(message)), repeat, setup)
+        for name, client_id, message, setup in messages
+    ]
+
+async def broadcast_cases(repeat, teardown):
+    """broadcast_to_all of a page switch at 10, 100 and 1000 clients"""
+    config = generate_config()
+    render_command = {'type': 'render_page', 'page_id': 'q0_0', 'page_config': config['q0_0']}
+    cases = []
+    for count in (10, 100, 1000):
+        server = QuizShowServer(config=config)
+        tasks = await connect_clients(server, count)
+        teardown.append(lambda server=server, tasks=tasks: disconnect_clients(server, tasks))
+        cases.append((f"broadcast_to_all[{count}]",
+                      lambda server=server: server.broadcast_to_all(render_command),
+                      max(repeat * 10 // count, 50),
+                      lambda server=server: clear_outboxes(server)))
+    return cases
+
+async def process_config_cases(repeat, teardown):
+    """process_config_for_client on a large generated config"""
+    server = QuizShowServer(config={})
+    cases = []
+    for cols, rows, images in ((6, 8, 50), (20, 50, 500)):
+        config = generate_config(cols, rows, images)
+        async def process(config=config):
+            server.process_config_for_client(config, '192.168.0.2')
+        cases.append((f"process_config_for_client[{len(config)} pages]", process, max(repeat // 10, 20), None))
+    return cases
+
+async def points_handler_cases(repeat, teardown):
+    """points_handler with 10 and 1000 connected clients"""
+    cases = []
+    for count in (10, 1000):
+        server = QuizShowServer(config=generate_config())
+        tasks = await connect_clients(server, count)
+        teardown.append(lambda server=server, tasks=tasks: disconnect_clients(server, tasks))
+        cases.append((f"points_handler[{count}]", lambda server=server: server.points_handler(None), repeat, None))
+    return cases
+
+async def run_benchmarks(repeat, passes):
+    """Run every benchmark once per pass and keep each one's fastest pass.
+
+    Interleaving the passes spreads every benchmark over the whole run, so a slow
+    stretch on a busy machine does not skew one benchmark in particular.
+    """
+    teardown = []
+    cases = calibration_cases(repeat, teardown)
+    for collect in (handle_message_cases, broadcast_cases, process_config_cases, points_handler_cases):
+        cases += await collect(repeat, teardown)
+
+    results = {}
+    for _ in range(passes):
+        for name, operation, case_repeat, setup in cases:
+            value = await measure(operation, case_repeat, setup)
+            results[name] = min(value, results.get(name, value))
+
+    for stop in teardown:
+        await stop()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print results next to the baseline and return the names that regressed.
+
+    Ratios are relative to the calibration workload, so a uniformly slower run
+    does not count as a regression.
+    """
+    regressions = []
+    scale = 1.0
+    if baseline.get(CALIBRATION):
+        scale = baseline[CALIBRATION] / results[CALIBRATION]
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'time':>12}  {'baseline':>12}  {'ratio':>6}")
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference and name != CALIBRATION:
+            ratio = value * scale / reference
+            flag = '  REGRESSION' if ratio > 1 + tolerance else ''
+            if flag:
+                regressions.append(name)
+            print(f"{name:<{width}}  {value:>10.1f}us  {reference:>10.1f}us  {ratio:>5.2f}x{flag}")
+        else:
+            print(f"{name:<{width}}  {value:>10.1f}us  {'-':>12}  {'-':>6}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the QuizShowServer hot paths in-process')
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per benchmark and pass (default: 200)')
+    parser.add_argument('--passes', type=int, default=5, help='passes over the whole suite (default: 5)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare against')
+    parser.add_argument('--save', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown before a result counts as a regression (default: 0.5 = 50%%)')
+    args = parser.parse_args()
+
+    # Per-message INFO logging would dominate every timing
+    logging.getLogger().setLevel(logging.WARNING)
+    results = asyncio.run(run_benchmarks(args.repeat, args.passes))
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({name: round(value, 2) for name, value in results.items()}, f, indent=4)
+        compare(results, {}, args.tolerance)
+        print(f"Saved baseline to {args.baseline}")
+        sys.exit(0)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    else:
+        print(f"No baseline at {args.baseline}, run with --save to create one")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline: {', '.join(regressions)}")
+    sys.exit(1 if regressions else 0)
@@ -1,12 +1,17 @@
 import asyncio
+import argparse
+import gzip
+import socket
+import struct
+import time
 import websockets
+from websockets.exceptions import ConnectionClosed
 import json
 import logging
 from datetime import datetime
 from typing import Dict, Set
 import json5  # For parsing JSONC files
-from aiohttp import web
-from aiohttp_cors import setup, ResourceOptions
+from aiohttp import web, WSMsgType
 import os
 import mimetypes
 
@@ -14,13 +19,130 @@ import mimetypes
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long a new process waits for the running server during a handoff
+HANDOFF_TIMEOUT = 10
+# How long the running server waits for clients to acknowledge the 1012 close, well below HANDOFF_TIMEOUT
+HANDOFF_CLOSE_TIMEOUT = 2
+
+def open_session_file(path, mode):
+    """Open a session recording, gzip-compressed if the name ends in .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def next_free_path(path):
+    """Return path, or path with a -2, -3, ... suffix before its extensions if it exists"""
+    directory, name = os.path.split(path)
+    stem, dot, extensions = name.partition('.')
+    candidate, number = path, 1
+    while os.path.exists(candidate):
+        number += 1
+        candidate = os.path.join(directory, f"{stem}-{number}{dot}{extensions}")
+    return candidate
+
+class SessionRecorder:
+    """Record inbound client messages as compact JSON lines for replay.py"""
+    def __init__(self, path, config, state=None):
+        self.path = path
+        self.file = open_session_file(path, 'w')
+        self.started = time.monotonic()
+        # Client ids are reused after disconnects, so events name connections by a serial of their own
+        self.connections = {}  # websocket -> serial
+        self.connection_count = 0
+        # The header carries the config so a replay does not depend on config.jsonc,
+        # and the game state when this process took it over from a previous one
+        header = {
+            'ev': 'session',
+            'version': 1,
+            'started_at': datetime.now().isoformat(),
+            'config': config
+        }
+        if state is not None:
+            header['state'] = state
+        self.write(header)
+        logger.info(f"Recording session to {path}")
+
+    def elapsed(self):
+        """Seconds since the recording started, rounded to milliseconds"""
+        return round(time.monotonic() - self.started, 3)
+
+    def write(self, event):
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        # Flush every event so a crashed or killed show still leaves a usable trace
+        self.file.flush()
+
+    def record_open(self, websocket, client_id, ip):
+        self.connection_count += 1
+        self.connections[websocket] = self.connection_count
+        self.write({'t': self.elapsed(), 'ev': 'open', 'conn': self.connection_count, 'client': client_id, 'ip': ip})
+
+    def record_close(self, websocket, client_id):
+        conn = self.connections.pop(websocket, None)
+        self.write({'t': self.elapsed(), 'ev': 'close', 'conn': conn, 'client': client_id})
+
+    def record_message(self, t, websocket, client_id, mode, message, state):
+        self.write({'t': t, 'ev': 'msg', 'conn': self.connections.get(websocket), 'client': client_id,
+                    'mode': mode, 'data': message, 'state': state})
+
+    def record_timer(self, page_id, state):
+        self.write({'t': self.elapsed(), 'ev': 'timer', 'page': page_id, 'state': state})
+
+    def close(self):
+        self.file.close()
+        logger.info(f"Session recording saved to {self.path}")
+
+class BoardState:
+    """Pressed buttons of the main grid, one byte per cell indexed column-major like config.table"""
+    def __init__(self, cols=0, rows=0):
+        self.cols = cols
+        self.rows = rows
+        self.cells = bytearray(cols * rows)
+        self.version = 0  # Bumped for every board_delta sent to clients
+
+    @classmethod
+    def from_config(cls, config):
+        """Size the board to fit the table of every main page"""
+        tables = [page.get('table', []) for page in config.values() if page.get('type') == 'main']
+        cols = max((len(table) for table in tables), default=0)
+        rows = max((len(column) for table in tables for column in table), default=0)
+        return cls(cols, rows)
+
+    def press(self, row, col):
+        """Mark a cell as pressed, returning False if it already was"""
+        index = col * self.rows + row
+        if self.cells[index]:
+            return False
+        self.cells[index] = 1
+        return True
+
+    def clear(self):
+        self.cells = bytearray(len(self.cells))
+
+    def pressed_keys(self):
+        """Pressed cells in the client's "row_col" format"""
+        rows = self.rows
+        return [f"{index % rows}_{index // rows}" for index, pressed in enumerate(self.cells) if pressed]
+
+    def load_keys(self, keys):
+        """Press the cells given in "row_col" format, skipping any that no longer fit"""
+        for key in keys:
+            row, col = (int(part) for part in key.split('_'))
+            if row < self.rows and col < self.cols:
+                self.press(row, col)
+
 class QuizShowServer:
-    def __init__(self):
+    def __init__(self, config=None, http_port=8080):
         self.clients: Dict[str, websockets.WebSocketServerProtocol] = {}
         self.client_info: Dict[str, dict] = {}
-        self.config = self.load_config()
+        self.http_port = http_port  # Port that serves /static, used for image URLs
+        self.config = config if config is not None else self.load_config()
+        self.recorder = None  # Optional SessionRecorder
+        self.draining = False  # Set while game state is being handed to a new process
+        self.handoff_outcome = None  # Future resolved to True once the new process took over
+        self.held_connections = set()  # Connections accepted while draining
         self.active_timers: Dict[str, asyncio.Task] = {}
-        self.pressed_buttons = set()  # Track pressed buttons for page 0
+        self.timer_deadlines: Dict[str, float] = {}  # Loop time at which each server timer fires
+        self.board = BoardState.from_config(self.config)  # Track pressed buttons for page 0
         self.last_render_command = None  # Track the last render command sent to all clients
         
         # Team management
@@ -54,9 +176,9 @@ class QuizShowServer:
                 if not image_path.startswith(('http://', 'https://', 'data:')):
                     # Use client IP if available, otherwise use localhost
                     if client_ip and client_ip != 'unknown':
-                        server_url = f"http://{client_ip}:8080/static/{image_path}"
+                        server_url = f"http://{client_ip}:{self.http_port}/static/{image_path}"
                     else:
-                        server_url = f"http://localhost:8080/static/{image_path}"
+                        server_url = f"http://localhost:{self.http_port}/static/{image_path}"
                     processed_page['image'] = server_url
                     logger.info(f"Converted local image path '{image_path}' to server URL '{server_url}'")
             
@@ -66,6 +188,14 @@ class QuizShowServer:
         
     async def register_client(self, websocket):
         """Register a new client connection"""
+        if self.draining:
+            # Accepted mid-handoff: hold the connection until we know which process owns the game
+            self.held_connections.add(websocket)
+            try:
+                if await self.handoff_outcome:
+                    return  # serve_handoff closed it with 1012
+            finally:
+                self.held_connections.discard(websocket)
         try:
             client_id = f"client_{len(self.clients) + 1}"
             self.clients[client_id] = websocket
@@ -76,6 +206,8 @@ class QuizShowServer:
             }
             
             logger.info(f"Client {client_id} connected from {self.client_info[client_id]['ip']}")
+            if self.recorder:
+                self.recorder.record_open(websocket, client_id, self.client_info[client_id]['ip'])
             
             # Send welcome message
             await websocket.send(json.dumps({
@@ -86,8 +218,17 @@ class QuizShowServer:
             
             try:
                 async for message in websocket:
-                    await self.handle_message(client_id, message)
-            except websockets.exceptions.ConnectionClosed:
+                    # handle_message drops messages during a handoff, so replay must not see them either
+                    if self.recorder and not self.draining:
+                        received_at = self.recorder.elapsed()
+                        mode = self.client_info[client_id].get('mode')
+                        try:
+                            await self.handle_message(client_id, message)
+                        finally:
+                            self.recorder.record_message(received_at, websocket, client_id, mode, message, self.get_state_snapshot())
+                    else:
+                        await self.handle_message(client_id, message)
+            except ConnectionClosed:
                 logger.info(f"Client {client_id} disconnected")
             finally:
                 await self.unregister_client(client_id)
@@ -103,6 +244,8 @@ class QuizShowServer:
                 await websocket.close()
             except Exception as e:
                 logger.debug(f"Error closing websocket for {client_id}: {e}")
+        if self.recorder and client_id in self.clients:
+            self.recorder.record_close(websocket, client_id)
         self.clients.pop(client_id, None)
         self.client_info.pop(client_id, None)
         logger.info(f"Client {client_id} unregistered")
@@ -113,6 +256,11 @@ class QuizShowServer:
             data = json.loads(message)
             message_type = data.get('type')
             
+            if self.draining:
+                # Already in flight when the connection was closed for the handoff
+                logger.warning(f"Dropped {message_type} from {client_id} during server handoff")
+                return
+            
             logger.info(f"Received message from {client_id}: {message_type}")
             
             if message_type == 'connect':
@@ -137,9 +285,10 @@ class QuizShowServer:
                     'config': processed_config
                 }))
                 
-                # Send the last render command if available, otherwise default to page 0
+                # Send the last render command if available, otherwise default to page 0.
+                # This is the only place clients get the full board, afterwards they get board_delta.
                 if self.last_render_command:
-                    await self.clients[client_id].send(json.dumps(self.last_render_command))
+                    await self.clients[client_id].send(json.dumps({**self.last_render_command, **self.board_snapshot()}))
                     # Update client's current page based on the last render command
                     self.client_info[client_id]['current_page'] = self.last_render_command['page_id']
                     # Update global current page
@@ -149,7 +298,7 @@ class QuizShowServer:
                     await self.clients[client_id].send(json.dumps({
                         'type': 'render_page',
                         'page_id': '0',
-                        'pressed_buttons': list(self.pressed_buttons)
+                        **self.board_snapshot()
                     }))
                     self.client_info[client_id]['current_page'] = '0'
                     # Update global current page
@@ -186,15 +335,24 @@ class QuizShowServer:
                 
                 # Send the last render command if available, otherwise default to page 0
                 if self.last_render_command:
-                    await self.clients[client_id].send(json.dumps(self.last_render_command))
+                    await self.clients[client_id].send(json.dumps({**self.last_render_command, **self.board_snapshot()}))
+                    # Resume on the current page, e.g. after a server handoff
+                    self.client_info[client_id]['current_page'] = self.last_render_command['page_id']
                 else:
                     # Default to page 0 if no previous render command
                     await self.clients[client_id].send(json.dumps({
                         'type': 'render_page',
                         'page_id': '0',
-                        'pressed_buttons': list(self.pressed_buttons)
+                        **self.board_snapshot()
                     }))
                 
+            elif message_type == 'get_board':
+                # Client noticed a gap in the board_delta versions
+                await self.clients[client_id].send(json.dumps({
+                    'type': 'board_snapshot',
+                    **self.board_snapshot()
+                }))
+                
             elif message_type == 'ping':
                 # Handle ping messages
                 await self.clients[client_id].send(json.dumps({
@@ -234,22 +392,23 @@ class QuizShowServer:
                     # IMPORTANT:
                     # config.table is column-major: table[col][row]
                     # Client sends (row, col). We must access table[col][row].
-                    if col < len(table) and row < len(table[col]):
-                        # Normalize button key to preserve existing format (row_col)
-                        button_key = f"{row}_{col}"
-                        if button_key in self.pressed_buttons:
-                            logger.info(f"Button {button_key} already pressed, ignoring")
-                            return
-
+                    if 0 <= col < len(table) and 0 <= row < len(table[col]):
                         # Mark button as pressed
-                        self.pressed_buttons.add(button_key)
-                        logger.info(f"Button {button_key} marked as pressed")
+                        if not self.board.press(row, col):
+                            logger.info(f"Button {row}_{col} already pressed, ignoring")
+                            return
+                        logger.info(f"Button {row}_{col} marked as pressed")
+                        change = {'pressed': [row, col]}
 
                         # Auto-disable both teams after button press by enabled team
                         if self.client_info[client_id].get('mode') == self.enabled_team:
                             self.enabled_team = 'none'
+                            change['enabled_team'] = self.enabled_team
                             logger.info(f"Auto-disabled both teams after button press by {self.client_info[client_id].get('mode')}")
 
+                        # One version step and one broadcast per click
+                        await self.broadcast_board_delta(change)
+
                         # Access the correct cell (column-major)
                         cell = table[col][row]
                         link_page = cell.get('link')
@@ -282,16 +441,6 @@ class QuizShowServer:
                             logger.info(f"All clients switched to page {link_page}")
                         else:
                             logger.warning(f"Invalid link page: {link_page}")
-
-                        # If teams were auto-disabled, broadcast the updated state
-                        if self.enabled_team == 'none':
-                            if self.last_render_command:
-                                updated_render_command = self.last_render_command.copy()
-                                if updated_render_command.get('page_id') == '0':
-                                    updated_render_command['pressed_buttons'] = list(self.pressed_buttons)
-                                    updated_render_command['enabled_team'] = self.enabled_team
-                                await self.broadcast_to_all(updated_render_command)
-                                logger.info("Broadcasted disabled state to all clients")
                             
             elif message_type == 'buzzer_press':
                 # Handle buzzer press
@@ -408,42 +557,23 @@ class QuizShowServer:
                     self.enabled_team = team
                     logger.info(f"Enabled team: {team}")
                     
-                    # Broadcast the current page with updated enabled team to all clients
-                    if self.last_render_command:
-                        # Send the last render command with updated enabled team
-                        updated_render_command = self.last_render_command.copy()
-                        if updated_render_command.get('page_id') == '0':
-                            # For page 0, include pressed buttons and enabled team
-                            updated_render_command['pressed_buttons'] = list(self.pressed_buttons)
-                            updated_render_command['enabled_team'] = self.enabled_team
-                        await self.broadcast_to_all(updated_render_command)
-                        logger.info(f"Broadcasted updated render command with enabled team: {team}")
-                    else:
-                        # If no last render command, send page 0 with current state
-                        render_command = {
-                            'type': 'render_page',
-                            'page_id': '0',
-                            'page_config': self.config['0'],
-                            'pressed_buttons': list(self.pressed_buttons),
-                            'enabled_team': self.enabled_team
-                        }
-                        await self.broadcast_to_all(render_command)
-                        logger.info(f"Broadcasted page 0 with enabled team: {team}")
+                    # Only the change goes out, clients keep their page
+                    await self.broadcast_board_delta({'enabled_team': self.enabled_team})
                     
             elif message_type == 'master_reset':
                 self.team_points = {'team_red': 0, 'team_blue': 0, 'team_yellow': 0, 'team_green': 0}
                 self.enabled_team = 'team_red'
                 self.last_buzzer_team = None
-                self.pressed_buttons.clear()
+                self.board.clear()
+                self.board.version += 1
                 logger.info("Reset all game state")
                 
-                # Broadcast the reset state to all clients
+                # Broadcast the reset state to all clients as a fresh snapshot
                 render_command = {
                     'type': 'render_page',
                     'page_id': '0',
                     'page_config': self.config['0'],
-                    'pressed_buttons': list(self.pressed_buttons),
-                    'enabled_team': self.enabled_team
+                    **self.board_snapshot()
                 }
                 await self.broadcast_to_all(render_command)
                 logger.info("Broadcasted reset state to all clients")
@@ -501,9 +631,7 @@ class QuizShowServer:
                 render_command = {
                     'type': 'render_page',
                     'page_id': '0',
-                    'page_config': self.config['0'],
-                    'pressed_buttons': list(self.pressed_buttons),
-                    'enabled_team': self.enabled_team
+                    'page_config': self.config['0']
                 }
                 
                 # Store as last render command
@@ -518,7 +646,7 @@ class QuizShowServer:
                 # Update global current page
                 self.global_current_page = '0'
                     
-                logger.info(f"Return to main: All clients switched to page 0 (pressed buttons: {list(self.pressed_buttons)})")
+                logger.info(f"Return to main: All clients switched to page 0 ({sum(self.board.cells)} pressed buttons)")
                 
             else:
                 logger.warning(f"Unknown message type: {message_type}")
@@ -530,9 +658,10 @@ class QuizShowServer:
             logger.error(f"Error handling message from client {client_id}: {e}")
             raise
     
-    async def start_server_timer(self, page_id, page_config):
-        """Start a server-side timer for a timer page"""
-        time_seconds = page_config.get('time', 0)
+    async def start_server_timer(self, page_id, page_config, time_seconds=None):
+        """Start a server-side timer for a timer page, optionally with a remaining time"""
+        if time_seconds is None:
+            time_seconds = page_config.get('time', 0)
         if time_seconds <= 0:
             return
             
@@ -544,7 +673,7 @@ class QuizShowServer:
         
         async def timer_task():
             try:
-                await asyncio.sleep(time_seconds)
+                await self.sleep_timer(page_id, time_seconds)
                 
                 # Timer finished - send render command to all clients
                 link_page = page_config.get('link')
@@ -571,16 +700,24 @@ class QuizShowServer:
                     logger.info(f"Server timer finished for page {page_id}, all clients switched to page {link_page}")
                 else:
                     logger.warning(f"Invalid link page for server timer: {link_page}")
+
+                if self.recorder:
+                    self.recorder.record_timer(page_id, self.get_state_snapshot())
                     
             except asyncio.CancelledError:
                 logger.info(f"Server timer for page {page_id} was cancelled")
             finally:
-                # Remove from active timers
-                if page_id in self.active_timers:
+                # Remove from active timers, unless a newer timer for this page already replaced us
+                if self.active_timers.get(page_id) is asyncio.current_task():
                     del self.active_timers[page_id]
         
         # Start the timer task
+        self.timer_deadlines[page_id] = asyncio.get_running_loop().time() + time_seconds
         self.active_timers[page_id] = asyncio.create_task(timer_task())
+
+    async def sleep_timer(self, page_id, time_seconds):
+        """Wait for a server-side timer to run out (replay.py fires timers from the recording instead)"""
+        await asyncio.sleep(time_seconds)
     
     async def broadcast_to_others(self, sender_id, message):
         """Broadcast message to all clients except sender"""
@@ -589,7 +726,7 @@ class QuizShowServer:
             if client_id != sender_id:
                 try:
                     await websocket.send(json.dumps(message))
-                except websockets.exceptions.ConnectionClosed:
+                except ConnectionClosed:
                     # Mark for removal
                     disconnected_clients.append(client_id)
         
@@ -600,23 +737,89 @@ class QuizShowServer:
     async def broadcast_to_all(self, message):
         """Broadcast message to all connected clients"""
         disconnected_clients = []
+        # Board state travels separately as board_delta, so every client gets the same payload
+        payload = json.dumps(message)
         for client_id, websocket in self.clients.items():
             try:
-                # If rendering page 0, include pressed buttons and team state
-                if message.get('type') == 'render_page' and message.get('page_id') == '0':
-                    message_with_buttons = message.copy()
-                    message_with_buttons['pressed_buttons'] = list(self.pressed_buttons)
-                    message_with_buttons['enabled_team'] = self.enabled_team
-                    await websocket.send(json.dumps(message_with_buttons))
-                else:
-                    await websocket.send(json.dumps(message))
-            except websockets.exceptions.ConnectionClosed:
+                await websocket.send(payload)
+            except ConnectionClosed:
                 disconnected_clients.append(client_id)
         
         # Clean up disconnected clients
         for client_id in disconnected_clients:
             await self.unregister_client(client_id)
     
+    async def broadcast_board_delta(self, change):
+        """Send one versioned board change (a pressed cell and/or the enabled team) to all clients"""
+        self.board.version += 1
+        await self.broadcast_to_all({'type': 'board_delta', 'version': self.board.version, **change})
+
+    def board_snapshot(self):
+        """Full board state, sent on (re)connect, on reset and when a client asks for it"""
+        return {
+            'board_version': self.board.version,
+            'pressed_buttons': self.board.pressed_keys(),
+            'enabled_team': self.enabled_team
+        }
+
+    def get_state_snapshot(self):
+        """Get the game state that session recordings are checked against"""
+        return {
+            'page': self.global_current_page,
+            'enabled_team': self.enabled_team,
+            'last_buzzer_team': self.last_buzzer_team,
+            'team_points': dict(self.team_points),
+            'pressed_buttons': sorted(self.board.pressed_keys())
+        }
+
+    def export_state(self):
+        """Serialize game state and remaining timer times for a handoff"""
+        now = asyncio.get_running_loop().time()
+        return {
+            'team_points': self.team_points,
+            'enabled_team': self.enabled_team,
+            'last_buzzer_team': self.last_buzzer_team,
+            'pressed_buttons': self.board.pressed_keys(),
+            'board_version': self.board.version,
+            'global_current_page': self.global_current_page,
+            'last_render_command': self.last_render_command,
+            'timers': {
+                page_id: max(0.0, self.timer_deadlines.get(page_id, now) - now)
+                for page_id in self.active_timers
+            }
+        }
+
+    def stop_timers(self):
+        """Cancel all server timers without switching pages"""
+        for task in self.active_timers.values():
+            task.cancel()
+        self.active_timers.clear()
+
+    async def restore_timers(self, timers):
+        """Restart server timers from a page_id -> remaining seconds mapping"""
+        for page_id, remaining in timers.items():
+            if page_id in self.config:
+                # A timer that ran out during the handoff fires right away
+                await self.start_server_timer(page_id, self.config[page_id], max(remaining, 0.001))
+
+    async def restore_state(self, state):
+        """Take over game state exported by the previous server process"""
+        self.team_points.update(state['team_points'])
+        self.enabled_team = state['enabled_team']
+        self.last_buzzer_team = state['last_buzzer_team']
+        self.board.load_keys(state['pressed_buttons'])
+        self.board.version = state.get('board_version', 0)
+        self.global_current_page = state['global_current_page']
+        
+        render_command = state['last_render_command']
+        if render_command and 'page_config' in render_command and render_command['page_id'] in self.config:
+            # Pick up edits to the current page from the reloaded config
+            render_command['page_config'] = self.config[render_command['page_id']]
+        self.last_render_command = render_command
+        
+        await self.restore_timers(state['timers'])
+        logger.info(f"Restored game state on page {self.global_current_page} with {len(state['timers'])} running timer(s)")
+
     def get_server_info(self):
         """Get server information"""
         return {
@@ -625,40 +828,29 @@ class QuizShowServer:
             'server_time': datetime.now().isoformat()
         }
 
-async def main():
-    server = QuizShowServer()
-    
-    # Create a proper handler function
-    async def handler(websocket):
-        await server.register_client(websocket)
-    
-    # HTTP server for points
-    async def points_handler(request):
+    async def points_handler(self, request):
+        """HTTP handler for /points"""
         # Count devices for each team
-        team_red_devices = sum(1 for info in server.client_info.values() if info.get('mode') == 'team_red')
-        team_blue_devices = sum(1 for info in server.client_info.values() if info.get('mode') == 'team_blue')
-        team_yellow_devices = sum(1 for info in server.client_info.values() if info.get('mode') == 'team_yellow')
-        team_green_devices = sum(1 for info in server.client_info.values() if info.get('mode') == 'team_green')
+        team_red_devices = sum(1 for info in self.client_info.values() if info.get('mode') == 'team_red')
+        team_blue_devices = sum(1 for info in self.client_info.values() if info.get('mode') == 'team_blue')
+        team_yellow_devices = sum(1 for info in self.client_info.values() if info.get('mode') == 'team_yellow')
+        team_green_devices = sum(1 for info in self.client_info.values() if info.get('mode') == 'team_green')
         
         return web.json_response({
-            'team_red': server.team_points['team_red'],
-            'team_blue': server.team_points['team_blue'],
-            'team_yellow': server.team_points['team_yellow'],
-            'team_green': server.team_points['team_green'],
-            'enabled_team': server.enabled_team,
-            'last_buzzer_team': server.last_buzzer_team,
+            'team_red': self.team_points['team_red'],
+            'team_blue': self.team_points['team_blue'],
+            'team_yellow': self.team_points['team_yellow'],
+            'team_green': self.team_points['team_green'],
+            'enabled_team': self.enabled_team,
+            'last_buzzer_team': self.last_buzzer_team,
             'team_red_devices': team_red_devices,
             'team_blue_devices': team_blue_devices,
             'team_yellow_devices': team_yellow_devices,
             'team_green_devices': team_green_devices
         })
-    
-    # Create HTTP app
-    app = web.Application()
-    app.router.add_get('/points', points_handler)
-    
-    # Add static file handler for local images
-    async def static_handler(request):
+
+    async def static_handler(self, request):
+        """HTTP handler for local images under /static"""
         # Get the file path from the URL
         file_path = request.match_info['path']
         
@@ -689,47 +881,287 @@ async def main():
                 'Cache-Control': 'public, max-age=3600',  # Cache for 1 hour
             }
         )
+
+    async def websocket_handler(self, request):
+        """aiohttp handler that upgrades to a WebSocket in unified mode"""
+        # heartbeat=20 pings like ping_interval=20 and waits 10s for the pong like ping_timeout=10
+        ws = web.WebSocketResponse(heartbeat=20)
+        await ws.prepare(request)
+        await self.register_client(AiohttpWebSocket(ws, request.remote))
+        return ws
+
+class AiohttpWebSocket:
+    """Wrap an aiohttp WebSocketResponse in the interface of a websockets connection"""
+    def __init__(self, ws, remote):
+        self.ws = ws
+        self.remote_address = (remote, 0) if remote else None
+
+    async def send(self, message):
+        try:
+            await self.ws.send_str(message)
+        except ConnectionResetError as e:
+            # Let the existing broadcast cleanup treat this like any other dropped client
+            raise ConnectionClosed(None, None) from e
+
+    async def close(self, code=1000, reason=''):
+        await self.ws.close(code=code, message=reason.encode('utf-8'))
+
+    async def __aiter__(self):
+        async for msg in self.ws:
+            if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+                yield msg.data
+            elif msg.type == WSMsgType.ERROR:
+                break
+
+async def allow_any_origin(request, response):
+    """Let the scoreboard fetch /points cross-origin without aiohttp_cors"""
+    response.headers['Access-Control-Allow-Origin'] = '*'
+
+def bind_listening_socket(port):
+    """Create a listening socket that can be handed to a replacement process"""
+    return socket.create_server(('0.0.0.0', port), backlog=100)
+
+def send_handoff_message(conn, payload, fds=()):
+    """Send length-prefixed JSON over the handoff socket, with file descriptors attached"""
+    body = json.dumps(payload).encode('utf-8')
+    socket.send_fds(conn, [struct.pack('!I', len(body))], list(fds))
+    conn.sendall(body)
+
+def receive_handoff_message(conn, maxfds=0):
+    """Receive a message sent with send_handoff_message, returning (payload, fds)"""
+    header, fds, _, _ = socket.recv_fds(conn, 4, maxfds)
+    while len(header) < 4:
+        chunk = conn.recv(4 - len(header))
+        if not chunk:
+            raise ConnectionError("Handoff peer closed the connection")
+        header += chunk
+    remaining = struct.unpack('!I', header)[0]
+    body = b''
+    while remaining:
+        chunk = conn.recv(remaining)
+        if not chunk:
+            raise ConnectionError("Handoff peer closed the connection")
+        body += chunk
+        remaining -= len(chunk)
+    return json.loads(body), fds
+
+def take_over(path, names):
+    """Take listening sockets and game state from the server running on the handoff socket.
+
+    Returns (control connection, sockets by name, state), or None if no server is running there.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        conn.close()
+        return None
+    
+    conn.settimeout(HANDOFF_TIMEOUT)
+    try:
+        send_handoff_message(conn, {'sockets': names})
+        reply, fds = receive_handoff_message(conn, maxfds=len(names))
+    except OSError as e:
+        # Includes the timeout, e.g. when the running server hangs instead of answering
+        conn.close()
+        raise RuntimeError(f"Server handoff failed, the running server did not answer: {e}") from e
+    if 'error' in reply:
+        conn.close()
+        raise RuntimeError(f"Server handoff refused: {reply['error']}")
+    
+    sockets = {name: socket.socket(fileno=fd) for name, fd in zip(reply['sockets'], fds)}
+    logger.info(f"Took over listening sockets {', '.join(sockets)} from the running server")
+    return conn, sockets, reply['state']
+
+async def close_connections(connections):
+    """Close connections with 1012 (Service Restart), waiting only briefly for the close handshakes.
+
+    A phone that went to sleep never answers the close frame, and waiting for it would
+    run the handoff into the new process's HANDOFF_TIMEOUT.
+    """
+    closing = [asyncio.create_task(websocket.close(1012, 'Server restart')) for websocket in list(connections)]
+    if closing:
+        await asyncio.wait(closing, timeout=HANDOFF_CLOSE_TIMEOUT)
+
+async def serve_handoff(server, path, listen_sockets, stop_listening):
+    """Wait for a replacement process on the handoff socket and hand it sockets and state"""
+    loop = asyncio.get_running_loop()
+    if os.path.exists(path):
+        os.unlink(path)  # Left behind by the process we took over from, or by a crash
+    control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control.bind(path)
+    control.listen(1)
+    control.setblocking(False)
+    logger.info(f"Waiting for server handoff requests on {path}")
+    
+    try:
+        while True:
+            conn, _ = await loop.sock_accept(control)
+            conn.setblocking(True)
+            conn.settimeout(30)
+            try:
+                request, _ = await loop.run_in_executor(None, receive_handoff_message, conn)
+                names = request.get('sockets', [])
+                missing = [name for name in names if name not in listen_sockets]
+                if missing:
+                    # e.g. a --unified process trying to replace a two-port one
+                    await loop.run_in_executor(None, send_handoff_message, conn, {
+                        'error': f"this server has no {', '.join(missing)} socket"
+                    })
+                    logger.warning(f"Refused server handoff, missing sockets: {missing}")
+                    continue
+                
+                # Freeze the game: from here on the state belongs to the new process
+                server.draining = True
+                server.handoff_outcome = loop.create_future()
+                state = server.export_state()
+                server.stop_timers()
+                
+                # 1012 (Service Restart) tells clients to reconnect right away, so nothing they
+                # send after the freeze is lost. Reconnects are held until the handoff is decided.
+                await close_connections(server.clients.values())
+                
+                def hand_over():
+                    send_handoff_message(conn, {'sockets': names, 'state': state},
+                                         [listen_sockets[name].fileno() for name in names])
+                    reply, _ = receive_handoff_message(conn)
+                    return reply.get('ready', False)
+                
+                if not await loop.run_in_executor(None, hand_over):
+                    raise ConnectionError("New server did not confirm the handoff")
+            except Exception as e:
+                logger.error(f"Server handoff failed, continuing to serve: {e}")
+                if server.draining:
+                    # Held reconnects carry on with this process
+                    server.draining = False
+                    server.handoff_outcome.set_result(False)
+                    await server.restore_timers(state['timers'])
+                continue
+            finally:
+                conn.close()
+            
+            logger.info("New server is ready, handing over held connections")
+            await stop_listening()
+            # Held connections reconnect to the new process, which now owns the listen backlog
+            await close_connections(server.held_connections)
+            server.handoff_outcome.set_result(True)
+            return
+    finally:
+        control.close()
+
+async def main(record=None, unified=False, port=8765, handoff=None):
+    listen_names = ['unified'] if unified else ['http', 'ws']
+    try:
+        inherited = take_over(handoff, listen_names) if handoff else None
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+    if inherited:
+        control, listen_sockets, state = inherited
+    else:
+        ports = {'unified': port} if unified else {'http': 8080, 'ws': port}
+        listen_sockets = {name: bind_listening_socket(p) for name, p in ports.items()}
+    http_socket = listen_sockets['unified' if unified else 'http']
+    
+    server = QuizShowServer(http_port=http_socket.getsockname()[1])
+    if record:
+        if inherited:
+            # The previous process may still be writing its part of the show to this file
+            record = next_free_path(record)
+        server.recorder = SessionRecorder(record, server.config, state if inherited else None)
+    if inherited:
+        await server.restore_state(state)
+    
+    # Create HTTP app
+    app = web.Application()
+    app.router.add_get('/points', server.points_handler)
     
     # Add route for static files
-    app.router.add_get('/static/{path:.*}', static_handler)
+    app.router.add_get('/static/{path:.*}', server.static_handler)
 
-    cors = setup(app, defaults={
-        "*": ResourceOptions(
-            allow_credentials=True,
-            expose_headers="*",
-            allow_headers="*",
-        )
-    })
+    if unified:
+        # WebSocket upgrades, scoreboard and images share one port and one loop
+        app.router.add_get('/', server.websocket_handler)
+        app.on_response_prepare.append(allow_any_origin)
+    else:
+        # Only the two-port setup needs aiohttp_cors, so unified mode never imports it
+        from aiohttp_cors import setup, ResourceOptions
 
-    for route in list(app.router.routes()):
-        cors.add(route)
+        cors = setup(app, defaults={
+            "*": ResourceOptions(
+                allow_credentials=True,
+                expose_headers="*",
+                allow_headers="*",
+            )
+        })
+
+        for route in list(app.router.routes()):
+            cors.add(route)
     
     # Start HTTP server
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, '0.0.0.0', 8080)
+    site = web.SockSite(runner, http_socket)
     await site.start()
-    logger.info("HTTP server started on http://0.0.0.0:8080/points")
-    
-    # Start WebSocket server
-    start_server = websockets.serve(
-        handler,
-        "0.0.0.0",  # Listen on all interfaces
-        8765,
-        ping_interval=20,
-        ping_timeout=10
-    )
-    
-    logger.info("Starting Quiz Show Server on ws://0.0.0.0:8765")
-    logger.info("Press Ctrl+C to stop the server")
     
+    ws_server = None
     try:
-        await start_server
-        await asyncio.Future()  # Run forever
+        if unified:
+            logger.info(f"Starting unified Quiz Show Server on ws://0.0.0.0:{server.http_port} "
+                        f"(points: http://0.0.0.0:{server.http_port}/points)")
+        else:
+            logger.info(f"HTTP server started on http://0.0.0.0:{server.http_port}/points")
+
+            # Create a proper handler function
+            async def handler(websocket):
+                await server.register_client(websocket)
+
+            # Start WebSocket server
+            ws_server = await websockets.serve(
+                handler,
+                sock=listen_sockets['ws'],  # Listens on all interfaces
+                ping_interval=20,
+                ping_timeout=10
+            )
+            
+            logger.info(f"Starting Quiz Show Server on ws://0.0.0.0:{listen_sockets['ws'].getsockname()[1]}")
+        
+        if inherited:
+            # The old process drains its connections once it sees this
+            send_handoff_message(control, {'ready': True})
+            control.close()
+        logger.info("Press Ctrl+C to stop the server")
+        
+        if handoff:
+            async def stop_listening():
+                await site.stop()
+                if ws_server:
+                    ws_server.close(close_connections=False)
+            
+            await serve_handoff(server, handoff, listen_sockets, stop_listening)
+            logger.info("Server handed off to the new process")
+        else:
+            await asyncio.Future()  # Run forever
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
     except Exception as e:
         logger.error(f"Server error: {e}")
+    finally:
+        if server.recorder:
+            server.recorder.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description='Quiz Show Server')
+    parser.add_argument('--record', metavar='FILE',
+                        help='record every inbound client message to FILE for replay.py (use .gz to compress)')
+    parser.add_argument('--unified', action='store_true',
+                        help='serve WebSocket, /points and /static from a single aiohttp server on --port')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='WebSocket port, in unified mode also used for HTTP (default: 8765)')
+    parser.add_argument('--handoff', metavar='PATH',
+                        help='restart without downtime: take over sockets and game state from the server '
+                             'listening on the Unix socket PATH, then listen there for the next restart')
+    args = parser.parse_args()
+    if args.handoff and not hasattr(socket, 'send_fds'):
+        parser.error('--handoff needs Unix socket file descriptor passing, which this platform lacks')
+    asyncio.run(main(record=args.record, unified=args.unified, port=args.port, handoff=args.handoff))
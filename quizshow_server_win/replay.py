@@ -0,0 +1,160 @@
+import asyncio
+import argparse
+import json
+import logging
+import sys
+import time
+
+from host import QuizShowServer, open_session_file
+
+logger = logging.getLogger('replay')
+
+class FakeWebSocket:
+    """In-memory stand-in for a websockets connection"""
+    def __init__(self, ip='127.0.0.1'):
+        self.remote_address = (ip, 0)
+        self.sent = []
+        self.closed = False
+        self.inbox = asyncio.Queue()
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            self.inbox.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+class ReplayServer(QuizShowServer):
+    """QuizShowServer whose timers only fire when the recording says they did"""
+    def __init__(self, config):
+        super().__init__(config=config)
+        self.timer_triggers: dict = {}
+
+    async def sleep_timer(self, page_id, time_seconds):
+        trigger = asyncio.Event()
+        self.timer_triggers[page_id] = trigger
+        await trigger.wait()
+
+    async def fire_timer(self, page_id):
+        """Let the pending timer for a page run out and wait for its page switch"""
+        task = self.active_timers.get(page_id)
+        if task is None:
+            return False
+        # A timer started by the previous event may not have reached sleep_timer yet
+        while page_id not in self.timer_triggers and not task.done():
+            await asyncio.sleep(0)
+        trigger = self.timer_triggers.pop(page_id, None)
+        if trigger is None:
+            return False
+        trigger.set()
+        await task
+        return True
+
+def load_session(path):
+    """Read a recording, returning the session header and the list of events"""
+    events = []
+    with open_session_file(path, 'r') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+        except EOFError:
+            # A gzip recording from a server that was killed has no end-of-stream marker
+            logger.warning(f"{path} ends abruptly, replaying the {len(events)} complete events")
+    if not events or events[0].get('ev') != 'session':
+        raise ValueError(f"{path} is not a session recording")
+    return events[0], events[1:]
+
+async def replay(path, speed=0.0):
+    """Drive a fresh server through a recording and return the number of state mismatches"""
+    header, events = load_session(path)
+    server = ReplayServer(header.get('config', {}))
+    if 'state' in header:
+        # Recorded by a process that took over from another one with --handoff
+        await server.restore_state(header['state'])
+    sockets = {}  # recorded connection -> (replay client_id, FakeWebSocket, register task)
+    mismatches = 0
+    previous_t = 0.0
+    started = time.perf_counter()
+
+    for index, event in enumerate(events, start=1):
+        if speed > 0 and event['t'] > previous_t:
+            await asyncio.sleep((event['t'] - previous_t) / speed)
+        previous_t = event['t']
+
+        kind = event['ev']
+        # Older recordings only have the client id, which the server reuses after disconnects
+        conn = event.get('conn', event.get('client'))
+        if kind == 'open':
+            websocket = FakeWebSocket(event.get('ip', '127.0.0.1'))
+            task = asyncio.create_task(server.register_client(websocket))
+            # register_client adds the client before its first real suspension point
+            await asyncio.sleep(0)
+            client_id = next(cid for cid, ws in server.clients.items() if ws is websocket)
+            sockets[conn] = (client_id, websocket, task)
+            continue
+
+        if kind == 'close':
+            entry = sockets.pop(conn, None)
+            if entry:
+                _, websocket, task = entry
+                await websocket.close()
+                await asyncio.gather(task, return_exceptions=True)
+            continue
+
+        if kind == 'msg':
+            entry = sockets.get(conn)
+            if entry is None:
+                logger.warning(f"Event {index}: message from unknown client {event['client']}")
+                continue
+            try:
+                await server.handle_message(entry[0], event['data'])
+            except Exception as e:
+                # The live server dropped this connection; the recording has the matching close
+                logger.warning(f"Event {index}: message from {event['client']} failed: {e}")
+        elif kind == 'timer':
+            if not await server.fire_timer(event['page']):
+                logger.error(f"Event {index}: no pending timer for page {event['page']}")
+        else:
+            logger.warning(f"Event {index}: unknown event type {kind}")
+            continue
+
+        state = server.get_state_snapshot()
+        if state != event['state']:
+            mismatches += 1
+            logger.error(f"Event {index} ({kind} at {event['t']}s): state diverged\n"
+                         f"  recorded: {event['state']}\n"
+                         f"  replayed: {state}")
+
+    # Shut down connections that were still open when the recording ended
+    for _, websocket, task in sockets.values():
+        await websocket.close()
+        await asyncio.gather(task, return_exceptions=True)
+    for task in list(server.active_timers.values()):
+        task.cancel()
+
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {len(events)} events from {path} in {elapsed:.3f}s: "
+          f"{mismatches} state mismatch{'es' if mismatches != 1 else ''}")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a session recorded with host.py --record')
+    parser.add_argument('recording', help='session file written by host.py --record')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='playback speed relative to the recording (default: 0 = as fast as possible)')
+    parser.add_argument('--verbose', action='store_true', help='show the server log while replaying')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    sys.exit(1 if asyncio.run(replay(args.recording, args.speed)) else 0)